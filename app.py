@@ -9,7 +9,7 @@ One-file service providing:
 Auth: set env API_KEY and include header `X-API-Key: <key>` on requests.
 
 Run locally:
-  pip install fastapi uvicorn playwright rapidfuzz python-dotenv "pydantic[email]" requests
+  pip install fastapi uvicorn playwright rapidfuzz numpy orjson python-dotenv "pydantic[email]" requests
   playwright install
   uvicorn app:app --host 0.0.0.0 --port 8000
 
@@ -17,30 +17,46 @@ Docker (optional):
   - See the Dockerfile snippet at the end of this file.
 
 Notes:
-  - This is headless by default. Set headless=False per request to visualize.
+  - The server always runs headless: each worker keeps one warm headless browser,
+    so the headless/slow_mo_ms options are accepted but ignored here.
   - Files can be provided via base64 payloads.
   - Respect website ToS; do not attempt CAPTCHA/2FA circumvention.
 """
 from __future__ import annotations
 
+import asyncio
 import base64
+import hmac
 import os
 import re
+import secrets
+import sys
+import tempfile
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple
-
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
 from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field, HttpUrl
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 
 # -----------------------------
 # Security helpers
 # -----------------------------
 
+# Read once at import; restart the service to rotate the key.
+_EXPECTED_API_KEY = (os.getenv("API_KEY") or "").encode()
+
 def require_api_key(x_api_key: Optional[str]):
-    expected = os.getenv("API_KEY")
-    if expected and x_api_key != expected:
+    if _EXPECTED_API_KEY and not hmac.compare_digest(_EXPECTED_API_KEY, (x_api_key or "").encode()):
         raise HTTPException(status_code=401, detail="Invalid API key")
 
 # -----------------------------
@@ -73,6 +89,7 @@ class SubmitHints(BaseModel):
     )
 
 class FillOptions(BaseModel):
+    # headless/slow_mo_ms are ignored in server mode (one warm headless browser per worker)
     headless: bool = True
     timeout_ms: int = Field(default=15000, ge=1000, le=120000)
     screenshot: bool = True
@@ -119,28 +136,75 @@ class DiscoverResponse(BaseModel):
 # Canonical keys and heuristics
 # -----------------------------
 
-CANONICAL_KEYS: Dict[str, List[str]] = {
-    "first_name": ["first name", "given name", "forename", "fname"],
-    "last_name": ["last name", "surname", "family name", "lname"],
-    "email": ["email", "e-mail", "mail"],
-    "phone": ["phone", "telephone", "mobile", "cell"],
-    "company": ["company", "organization", "organisation", "employer"],
-    "address_line1": ["address", "street", "address line 1", "addr1"],
-    "city": ["city", "town"],
-    "state": ["state", "region", "province", "county"],
-    "postal_code": ["zip", "zipcode", "postal", "postcode"],
-    "country": ["country", "nation"],
-    "dob": ["date of birth", "birthday", "birth date", "dob"],
+CANONICAL_KEYS: Dict[str, Tuple[str, ...]] = {
+    "first_name": ("first name", "given name", "forename", "fname"),
+    "last_name": ("last name", "surname", "family name", "lname"),
+    "email": ("email", "e-mail", "mail"),
+    "phone": ("phone", "telephone", "mobile", "cell"),
+    "company": ("company", "organization", "organisation", "employer"),
+    "address_line1": ("address", "street", "address line 1", "addr1"),
+    "city": ("city", "town"),
+    "state": ("state", "region", "province", "county"),
+    "postal_code": ("zip", "zipcode", "postal", "postcode"),
+    "country": ("country", "nation"),
+    "dob": ("date of birth", "birthday", "birth date", "dob"),
     # Booleans / agreements
-    "accept_tos": ["terms", "tos", "agree", "agreement", "privacy"],
+    "accept_tos": ("terms", "tos", "agree", "agreement", "privacy"),
 }
 
-ALIASES: Dict[str, List[str]] = {
-    "postal_code": ["zip", "zipcode", "post_code"],
-    "address_line1": ["address1", "street", "line1"],
+ALIASES: Dict[str, Tuple[str, ...]] = {
+    "postal_code": ("zip", "zipcode", "post_code"),
+    "address_line1": ("address1", "street", "line1"),
 }
 
-PHONE_RE = re.compile(r"[^\d+]")
+# Intern every key and synonym once so dict probes against them hit on identity
+CANONICAL_KEYS = {sys.intern(k): tuple(map(sys.intern, v)) for k, v in CANONICAL_KEYS.items()}
+ALIASES = {sys.intern(k): tuple(map(sys.intern, v)) for k, v in ALIASES.items()}
+
+class _PhoneCharTable(dict):
+    """str.translate table that keeps digits and '+' and drops everything else."""
+
+    def __missing__(self, cp: int) -> Optional[int]:
+        keep = cp == 0x2B or chr(cp).isdecimal()  # same set as the old [^\d+] regex
+        self[cp] = cp if keep else None
+        return self[cp]
+
+# ASCII is pre-filled; other code points are resolved on first sight
+PHONE_TABLE = _PhoneCharTable({cp: cp if chr(cp) in "0123456789+" else None for cp in range(128)})
+
+# Decisive label keywords, by priority; checked after the plain "email" substring test
+KEYWORD_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("postal_code", ("zip", "postal", "postcode")),
+    ("first_name", ("first", "given", "forename")),
+    ("last_name", ("last", "surname", "family")),
+    ("phone", ("phone", "mobile", "cell", "tel")),
+    ("company", ("company", "organization", "organisation", "employer")),
+    ("city", ("city", "town")),
+    ("state", ("state", "region", "province", "county")),
+    ("country", ("country", "nation")),
+    ("dob", ("date of birth", "birthday", "dob")),
+    ("address_line1", ("address", "street")),
+    ("accept_tos", ("terms", "privacy", "agree", "accept")),
+]
+# keyword -> (priority, canonical key)
+KW_TO_CANON: Dict[str, Tuple[int, str]] = {
+    sys.intern(kw): (rank, canon) for rank, (canon, kws) in enumerate(KEYWORD_RULES) for kw in kws
+}
+# Whole words (same boundaries as \b), plus the one multi-word keyword
+WORD_RE = re.compile(r"date of birth\b|\w+")
+
+# Flattened synonym table for fuzzy matching: one entry per (canonical, synonym),
+# in CANONICAL_KEYS order so ties resolve the same way as a nested scan would.
+SYNONYM_CHOICES: List[str] = [s for canon, syns in CANONICAL_KEYS.items() for s in (canon, *syns)]
+SYNONYM_CANON = np.array([canon for canon, syns in CANONICAL_KEYS.items() for _ in (canon, *syns)])
+FUZZY_CUTOFF = 65
+
+# lower-cased label -> canonical key. The key table is static, so a label always
+# classifies the same way and repeat visits to a form skip scoring entirely.
+LABEL_CACHE_SIZE = 4096
+_LABEL_CACHE: "OrderedDict[str, Optional[str]]" = OrderedDict()
+_LABEL_CACHE_LOCK = threading.Lock()  # shared by all browser worker threads
+_UNSEEN = object()
 
 # -----------------------------
 # Core logic
@@ -149,13 +213,21 @@ PHONE_RE = re.compile(r"[^\d+]")
 # Site-specific helpers (Verint Cloud forms)
 VERINT_HOSTS = ["verintcloudservices.com", "empro.verintcloudservices.com"]
 
+START_RE = re.compile(r"^start$", re.I)
+PASSWORD_PROMPT_RE = re.compile(r"Please enter a password", re.I)
+PASSWORD_LABEL_RE = re.compile(r"^password$", re.I)
+CONFIRM_PASSWORD_RE = re.compile(r"confirm password", re.I)
+SAVE_RE = re.compile(r"save", re.I)
+
+_VERINT_SUFFIXES = tuple("." + h for h in VERINT_HOSTS)
+
+@lru_cache(maxsize=512)
 def _is_verint(url: str) -> bool:
     try:
-        from urllib.parse import urlparse
-        netloc = urlparse(url).netloc.lower()
-        return any(h in netloc for h in VERINT_HOSTS)
-    except Exception:
+        host = urlsplit(url).hostname or ""  # already lower-cased, port stripped
+    except ValueError:
         return False
+    return host in VERINT_HOSTS or host.endswith(_VERINT_SUFFIXES)
 
 def _verint_start_flow(page, timeout_ms: int, logs: List[str], create_password: bool = False):
     """
@@ -163,132 +235,138 @@ def _verint_start_flow(page, timeout_ms: int, logs: List[str], create_password:
     this specific HSH form typically does not, but we handle it if it appears.
     """
     try:
-        start_btn = page.get_by_role("button", name=re.compile(r"^start$", re.I))
+        start_btn = page.get_by_role("button", name=START_RE)
         if start_btn.count() > 0 and start_btn.first.is_visible():
             start_btn.first.click()
-            try:
+            with suppress(Exception):
                 page.wait_for_load_state("networkidle", timeout=timeout_ms)
-            except Exception:
-                pass
     except Exception as e:
         logs.append(f"Start button not found/failed: {e}")
 
     # Password panel handler (rare on this form, safe no-op otherwise)
     try:
-        if page.get_by_text(re.compile(r"Please enter a password", re.I)).count() > 0:
+        if page.get_by_text(PASSWORD_PROMPT_RE).count() > 0:
             pwd = "A1" + str(int(time.time())) if create_password else "A1temporary"
             try:
-                page.get_by_label(re.compile(r"^password$", re.I)).fill(pwd)
+                page.get_by_label(PASSWORD_LABEL_RE).fill(pwd)
             except Exception:
                 page.locator("input[type='password']").first.fill(pwd)
             try:
-                page.get_by_label(re.compile(r"confirm password", re.I)).fill(pwd)
+                page.get_by_label(CONFIRM_PASSWORD_RE).fill(pwd)
             except Exception:
                 page.locator("input[type='password']").nth(1).fill(pwd)
             try:
-                page.get_by_role("button", name=re.compile(r"save", re.I)).click()
+                page.get_by_role("button", name=SAVE_RE).click()
             except Exception:
                 page.locator("button:has-text('Save')").first.click()
-            try:
+            with suppress(Exception):
                 page.wait_for_load_state("networkidle", timeout=timeout_ms)
-            except Exception:
-                pass
     except Exception as e:
         logs.append(f"Password step handling error: {e}")
 
-def _candidate_text(page_el) -> str:
-    txts: List[str] = []
-    # associated <label for="id">
-    try:
-        lab = page_el.evaluate(
-            """
-        el => {
-            const id = el.id;
-            const lab = id ? document.querySelector(`label[for="${id}"]`) : null;
-            return lab ? lab.innerText.trim() : null;
-        }
-        """
-        )
-        if lab:
-            txts.append(lab)
-    except Exception:
-        pass
-
-    for attr in ["aria-label", "aria-labelledby", "name", "id", "placeholder", "autocomplete"]:
-        try:
-            v = page_el.get_attribute(attr)
-            if v:
-                txts.append(v)
-        except Exception:
-            pass
-
-    try:
-        near = page_el.evaluate(
-            """
-        el => {
-            let t = "";
-            const prev = el.previousElementSibling;
-            if (prev) t += (prev.innerText || "").trim();
-            const p = el.parentElement;
-            if (p) t += " " + ((p.innerText || "").trim());
-            return t.slice(0, 300);
-        }
-        """
-        )
-        if near:
-            txts.append(near)
-    except Exception:
-        pass
+# One round-trip per frame: collects label metadata for every visible input/textarea/select
+# and tags each with data-ff-idx so it can be located again if it needs filling.
+_JS_HARVEST = """
+() => {
+    document.querySelectorAll("[data-ff-idx]").forEach(el => el.removeAttribute("data-ff-idx"));
+    const attrs = ["aria-label", "aria-labelledby", "name", "id", "placeholder", "autocomplete"];
+    const out = [];
+    for (const el of document.querySelectorAll("input, textarea, select")) {
+        const type = el.getAttribute("type") || "";
+        if (type.toLowerCase() === "hidden") continue;
+        // same notion of visibility as Playwright's is_visible()
+        const rect = el.getBoundingClientRect();
+        if (!rect.width || !rect.height || getComputedStyle(el).visibility === "hidden") continue;
+
+        const idx = out.length;
+        const html = el.outerHTML.slice(0, 200);  // before tagging: previews show page markup only
+        el.setAttribute("data-ff-idx", String(idx));
+        const lab = el.id ? document.querySelector(`label[for="${CSS.escape(el.id)}"]`) : null;
+        let near = "";
+        const prev = el.previousElementSibling;
+        if (prev) near += (prev.innerText || "").trim();
+        const p = el.parentElement;
+        if (p) near += " " + ((p.innerText || "").trim());
+        out.push({
+            idx,
+            tag: el.tagName.toLowerCase(),
+            type,
+            label: lab ? lab.innerText.trim() : null,
+            attrs: attrs.map(a => el.getAttribute(a)),
+            near: near.slice(0, 300),
+            outer_html: html,
+        });
+    }
+    return out;
+}
+"""
 
+def _candidate_text(field: Dict[str, Any]) -> str:
+    # <label for=id>, then identifying attributes, then nearby text
+    txts = [field.get("label"), *field.get("attrs", []), field.get("near")]
     return " ".join([t for t in txts if t]).strip()
 
 def _guess_canonical_key(text: str) -> Optional[str]:
+    """Keyword rules only; fuzzy matching is batched in `_classify_labels`."""
     t = (text or "").lower()
     if "email" in t:
         return "email"
-    if re.search(r"\b(zip|postal|postcode)\b", t):
-        return "postal_code"
-    if re.search(r"\b(first|given|forename)\b", t):
-        return "first_name"
-    if re.search(r"\b(last|surname|family)\b", t):
-        return "last_name"
-    if re.search(r"\b(phone|mobile|cell|tel)\b", t):
-        return "phone"
-    if re.search(r"\b(company|organization|organisation|employer)\b", t):
-        return "company"
-    if re.search(r"\b(city|town)\b", t):
-        return "city"
-    if re.search(r"\b(state|region|province|county)\b", t):
-        return "state"
-    if re.search(r"\b(country|nation)\b", t):
-        return "country"
-    if re.search(r"\b(date of birth|birthday|dob)\b", t):
-        return "dob"
-    if re.search(r"\b(address|street)\b", t):
-        return "address_line1"
-    if re.search(r"\b(terms|privacy|agree|accept)\b", t):
-        return "accept_tos"
-
-    best = None
-    best_score = -1
-    for canon, syns in CANONICAL_KEYS.items():
-        for s in [canon] + syns:
-            score = fuzz.partial_ratio(t, s)
-            if score > best_score:
-                best_score, best = score, canon
-    return best if best_score >= 65 else None
+    hits = [KW_TO_CANON[w] for w in WORD_RE.findall(t) if w in KW_TO_CANON]
+    return min(hits)[1] if hits else None
+
+def _classify_labels(labels: List[str]) -> List[Optional[str]]:
+    """
+    Canonical key per label. Cached labels are answered from _LABEL_CACHE; of the
+    rest, keyword rules win and every label they miss is scored against all synonyms
+    in one rapidfuzz.process.cdist call.
+    """
+    texts = [(t or "").lower() for t in labels]
+    with _LABEL_CACHE_LOCK:
+        canons = [_LABEL_CACHE.get(t, _UNSEEN) for t in texts]
+        for t, c in zip(texts, canons):
+            if c is not _UNSEEN:
+                _LABEL_CACHE.move_to_end(t)
+    todo = [i for i, c in enumerate(canons) if c is _UNSEEN]
+    if not todo:
+        return canons
+
+    for i in todo:
+        canons[i] = _guess_canonical_key(texts[i])
+    misses = [i for i in todo if canons[i] is None]
+    if misses:
+        scores = process.cdist(
+            [texts[i] for i in misses],
+            SYNONYM_CHOICES,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=FUZZY_CUTOFF,
+            dtype=np.uint8,
+            workers=-1,
+        )
+        # argmax keeps the first best column, i.e. the earliest synonym in table order
+        best = scores.argmax(axis=1)
+        hit = scores[np.arange(len(misses)), best] > 0
+        for row, i in enumerate(misses):
+            if hit[row]:
+                canons[i] = str(SYNONYM_CANON[best[row]])
+
+    with _LABEL_CACHE_LOCK:
+        for i in todo:
+            _LABEL_CACHE[texts[i]] = canons[i]
+        while len(_LABEL_CACHE) > LABEL_CACHE_SIZE:
+            _LABEL_CACHE.popitem(last=False)
+    return canons
 
 def _best_data_value(canon_key: str, data: Dict[str, Any]) -> Any:
     if canon_key in data:
         return data[canon_key]
-    for a in ALIASES.get(canon_key, []):
+    for a in ALIASES.get(canon_key, ()):
         if a in data:
             return data[a]
     return None
 
 def _normalize_value(key: str, value: Any) -> Any:
     if key == "phone" and isinstance(value, str):
-        digits = PHONE_RE.sub("", value)
+        digits = value.translate(PHONE_TABLE)
         return digits if digits.startswith("+") else ("+" + digits if digits else digits)
     return value
 
@@ -304,42 +382,66 @@ def _login_if_needed(page, login: Optional[Login], timeout_ms: int, logs: List[s
     except PWTimeout:
         logs.append("Post-login network idle not reached; continuing.")
 
-def _discover_fields(page) -> List[Tuple[Any, Any, Dict[str, str]]]:
-    frames = [page, *page.frames]
+def _harvest_frame(f, with_handles: bool = True) -> List[Tuple[Any, Any, Dict[str, str]]]:
+    """
+    Discovered fields of one frame; best-effort, an unreadable frame yields [].
+    with_handles=False skips resolving elements (metadata only, nothing will be filled).
+    """
+    if f.is_detached():  # local check, no round-trip
+        return []
+    try:
+        fields = f.evaluate(_JS_HARVEST)
+        # Stable handles for every tagged field in one call (document order == idx order)
+        handles = f.locator("[data-ff-idx]").element_handles() if fields and with_handles else []
+    except Exception:
+        return []
+    if not with_handles:
+        handles = [None] * len(fields)
+    elif len(handles) != len(fields):
+        # DOM changed between the two calls; fall back to per-field lazy locators
+        handles = [f.locator(f"[data-ff-idx='{field['idx']}']") for field in fields]
+    out: List[Tuple[Any, Any, Dict[str, str]]] = []
+    for field, el in zip(fields, handles):
+        meta = {
+            "frame": f.name or "main",
+            "tag": field["tag"],
+            "type": field["type"],
+            "text": _candidate_text(field),
+            "selector_preview": field["outer_html"] or "",
+        }
+        out.append((f, el, meta))
+    return out
+
+def _discover_fields(page, with_handles: bool = True) -> List[Tuple[Any, Any, Dict[str, str]]]:
+    # Sequential on purpose: sync Playwright objects belong to the worker thread that
+    # created them, so frames cannot be harvested from a thread pool.
     discovered: List[Tuple[Any, Any, Dict[str, str]]] = []
-    for f in frames:
-        loc = f.locator("input, textarea, select").filter(has_not=f.locator("[type='hidden']"))
-        count = 0
-        try:
-            count = loc.count()
-        except Exception:
-            pass
-        for i in range(count):
-            el = loc.nth(i)
-            try:
-                if not el.is_visible():
-                    continue
-            except Exception:
-                continue
-            try:
-                tag = el.evaluate("e=>e.tagName.toLowerCase()")
-            except Exception:
-                tag = ""
-            typ = el.get_attribute("type") or ""
-            meta = {
-                "frame": f.name or "main",
-                "tag": tag,
-                "type": typ,
-                "text": _candidate_text(el),
-                "selector_preview": el.evaluate("e=>e.outerHTML.slice(0,200)") or "",
-            }
-            discovered.append((f, el, meta))
+    for f in page.frames:  # includes the main frame
+        discovered.extend(_harvest_frame(f, with_handles))
     return discovered
 
+def _field_match(meta: Dict[str, str], canon: Optional[str],
+                 value_used: Optional[str] = None, filled: bool = False) -> FieldMatch:
+    return FieldMatch(
+        frame=meta.get("frame", "main"),
+        tag=meta.get("tag", ""),
+        type=meta.get("type", ""),
+        label_text=meta.get("text", ""),
+        canonical_key=canon,
+        value_used=value_used,
+        selector_preview=meta.get("selector_preview", ""),
+        filled=filled,
+    )
+
+def _classify_discovered(discovered) -> List[FieldMatch]:
+    """Canonical keys for discovered fields, without touching the page (used by /discover)."""
+    canons = _classify_labels([meta.get("text", "") for _, _, meta in discovered])
+    return [_field_match(meta, canon) for (_, _, meta), canon in zip(discovered, canons)]
+
 def _fill_discovered(page, discovered, data: Dict[str, Any], timeout_ms: int, logs: List[str]):
     matched: List[FieldMatch] = []
-    for f, el, meta in discovered:
-        canon = _guess_canonical_key(meta.get("text", ""))
+    canons = _classify_labels([meta.get("text", "") for _, _, meta in discovered])
+    for (f, el, meta), canon in zip(discovered, canons):
         value = _best_data_value(canon, data) if canon else None
         filled = False
         value_used: Optional[str] = None
@@ -365,44 +467,36 @@ def _fill_discovered(page, discovered, data: Dict[str, Any], timeout_ms: int, lo
                 value_used = str(value)
         except Exception as e:
             logs.append(f"Fill error: {e}")
-        matched.append(
-            FieldMatch(
-                frame=meta.get("frame", "main"),
-                tag=meta.get("tag", ""),
-                type=meta.get("type", ""),
-                label_text=meta.get("text", ""),
-                canonical_key=canon,
-                value_used=value_used,
-                selector_preview=meta.get("selector_preview", ""),
-                filled=filled,
-            )
-        )
+        matched.append(_field_match(meta, canon, value_used, filled))
     return matched
 
+SUBMIT_NAME_RE = re.compile(r"submit", re.I)
+ADVANCE_NAME_RE = re.compile(r"next|continue", re.I)
+SUBMIT_TYPE_SELECTOR = "button[type='submit'], input[type='submit']"
+
 def _submit_if_possible(page, submit: Optional[SubmitHints], timeout_ms: int, logs: List[str]):
-    selectors = []
+    candidates = []
     if submit and submit.selector:
-        selectors.append(submit.selector)
-    selectors += [
-        "button[type='submit']",
-        "input[type='submit']",
-        "button:has-text('Submit')",
-        "button:has-text('Next')",
-        "button:has-text('Continue')",
-        "[role='button']:has-text('Submit')",
+        candidates.append((submit.selector, page.locator(submit.selector)))
+    # Most specific first: a real submit control beats an earlier "Next"/"Continue…"
+    # (datepicker arrows, "Continue with Google") that happens to come first in the DOM
+    candidates += [
+        ("submit-type control", page.locator(SUBMIT_TYPE_SELECTOR)),
+        ("submit button", page.get_by_role("button", name=SUBMIT_NAME_RE)),
+        ("next/continue button", page.get_by_role("button", name=ADVANCE_NAME_RE)),
     ]
-    for s in selectors:
+    for desc, loc in candidates:
         try:
-            btn = page.locator(s)
-            if btn.count() > 0 and btn.first.is_visible():
-                btn.first.click()
+            btn = loc.filter(visible=True).first
+            if btn.is_visible():
+                btn.click()
                 if submit and submit.wait_selector:
                     page.wait_for_selector(submit.wait_selector, timeout=timeout_ms)
                 else:
                     page.wait_for_load_state("networkidle", timeout=timeout_ms)
                 return True
         except Exception as e:
-            logs.append(f"Submit attempt failed for selector {s}: {e}")
+            logs.append(f"Submit attempt failed for {desc}: {e}")
     return False
 
 # -----------------------------
@@ -414,24 +508,50 @@ MONTHS = {m.lower(): i for i, m in enumerate([
     "August","September","October","November","December"
 ])}
 
+BIRTHDATE_RE = re.compile(r"Birthdate", re.I)
+PHONE_OWNER_RE = re.compile(r"^Phone Owner$", re.I)
+ALT_PHONE_OWNER_RE = re.compile(r"Alternate Phone Owner", re.I)
+NOTES_LABEL_RE = re.compile(r"Anything we need to know\?", re.I)
+# YYYY-MM-DD (month may also be a name, e.g. 1985-July-15)
+DOB_RE = re.compile(r"(\d{4})-(\d{1,2}|[a-z]+)-(\d{1,2})", re.I)
+
+# Index of the first <option> whose text contains the value (case-insensitive), or -1
+_JS_OPTION_INDEX = """
+(sel, value) => {
+    const needle = value.toLowerCase();
+    return [...sel.options].findIndex(o => (o.innerText || "").trim().toLowerCase().includes(needle));
+}
+"""
+
+# Checks every checkbox whose label (or aria-label) contains one of the names,
+# case-insensitive; returns the names that matched at least one box.
+_JS_CHECK_BY_LABEL = """
+(names) => {
+    const wanted = names.map(n => [n, n.toLowerCase()]);
+    const found = new Set();
+    for (const cb of document.querySelectorAll("input[type='checkbox']")) {
+        const text = [...(cb.labels || [])].map(l => l.innerText).concat(cb.getAttribute("aria-label") || "")
+            .join(" ").toLowerCase();
+        for (const [name, needle] of wanted) {
+            if (!text.includes(needle)) continue;
+            if (!cb.checked) cb.click();
+            if (cb.checked) found.add(name);  // disabled or reverted boxes count as missed
+        }
+    }
+    return [...found];
+}
+"""
+
 def _select_option_by_label_or_value(el, value: str):
-    try:
+    with suppress(Exception):
         el.select_option(label=str(value)); return
-    except Exception:
-        pass
-    try:
+    with suppress(Exception):
         el.select_option(value=str(value)); return
-    except Exception:
-        pass
-    # last resort: click an <option> whose text contains the value
-    try:
-        opts = el.locator("option")
-        for i in range(opts.count()):
-            t = (opts.nth(i).inner_text() or "").strip()
-            if str(value).lower() in t.lower():
-                opts.nth(i).click(); return
-    except Exception:
-        pass
+    # last resort: the first <option> whose text contains the value
+    with suppress(Exception):
+        idx = el.evaluate(_JS_OPTION_INDEX, str(value))
+        if idx >= 0:
+            el.select_option(index=idx)
 
 def _fill_hsh_specific(page, data: Dict[str, Any], timeout_ms: int, logs: List[str]):
     """
@@ -446,14 +566,13 @@ def _fill_hsh_specific(page, data: Dict[str, Any], timeout_ms: int, logs: List[s
     # --- Birthdate (from `dob` = YYYY-MM-DD or birth_month/day/year) ---
     dob = data.get("dob") or data.get("date_of_birth")
     bmon = data.get("birth_month"); bday = data.get("birth_day"); byear = data.get("birth_year")
-    if isinstance(dob, str) and len(dob.split("-")) == 3:
-        byear, bmon, bday = dob.split("-")
-        try:
+    m = DOB_RE.fullmatch(dob) if isinstance(dob, str) else None
+    if m:
+        byear, bmon, bday = m.groups()
+        if bmon.isdigit():
             bmon = int(bmon)
-        except Exception:
-            pass
     try:
-        if page.get_by_text(re.compile(r"Birthdate", re.I)).count() > 0:
+        if page.get_by_text(BIRTHDATE_RE).count() > 0:
             # Heuristic: the first 3 visible selects near the birthdate area are month/day/year
             selects = page.locator("select")
             visible = [selects.nth(i) for i in range(selects.count()) if selects.nth(i).is_visible()]
@@ -471,13 +590,13 @@ def _fill_hsh_specific(page, data: Dict[str, Any], timeout_ms: int, logs: List[s
         logs.append(f"Birthdate fill error: {e}")
 
     # --- Phone Owner / Alternate Phone Owner ---
-    for key, label_rx in [("phone_owner", r"^Phone Owner$"),
-                          ("alt_phone_owner", r"Alternate Phone Owner")]:
+    for key, label_rx in [("phone_owner", PHONE_OWNER_RE),
+                          ("alt_phone_owner", ALT_PHONE_OWNER_RE)]:
         val = data.get(key)
         if not val:
             continue
         try:
-            sel = page.get_by_label(re.compile(label_rx, re.I))
+            sel = page.get_by_label(label_rx)
             if sel.count() > 0:
                 _select_option_by_label_or_value(sel.first, str(val))
         except Exception as e:
@@ -495,115 +614,210 @@ def _fill_hsh_specific(page, data: Dict[str, Any], timeout_ms: int, logs: List[s
     shelters = data.get("shelters") or []
     if isinstance(shelters, str):
         shelters = [s.strip() for s in shelters.split(",") if s.strip()]
-    for s in shelters:
+    if shelters:
         try:
-            page.get_by_label(re.compile(re.escape(s), re.I)).check()
-        except Exception:
-            # fallback: try any checkbox near text
-            try:
-                box = page.locator("input[type='checkbox']").filter(has_text=s)
-                if box.count() > 0:
-                    box.first.check()
-            except Exception as e:
-                logs.append(f"Shelter checkbox '{s}' error: {e}")
+            found = set(page.evaluate(_JS_CHECK_BY_LABEL, [str(s) for s in shelters]))
+            for s in shelters:
+                if str(s) not in found:
+                    logs.append(f"Shelter checkbox '{s}' not found")
+        except Exception as e:
+            logs.append(f"Shelter checkboxes error: {e}")
 
     # --- Notes ("Anything we need to know?") ---
     if data.get("notes"):
+        with suppress(Exception):
+            page.get_by_label(NOTES_LABEL_RE).fill(str(data["notes"]))
+
+# -----------------------------
+# Browser pool
+# -----------------------------
+
+# Number of browser worker threads (= concurrent Playwright sessions)
+PW_WORKERS = int(os.getenv("PW_WORKERS", "2"))
+
+class _BrowserWorker:
+    """
+    One Playwright driver pinned to its own thread (the sync API must be used from
+    the thread that started it). It keeps one headless browser alive for its whole
+    life; every job gets a fresh context that is closed afterwards. Client
+    headless/slow_mo options are not honoured, so no job can relaunch or multiply it.
+    """
+
+    def __init__(self, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._pw = None
+        self._browser_obj = None
+
+    def _browser(self):
+        browser = self._browser_obj
+        if browser is None or not browser.is_connected():
+            if self._pw is None:
+                self._pw = sync_playwright().start()
+            browser = self._browser_obj = self._pw.chromium.launch(headless=True)
+        return browser
+
+    def _run(self, fn: Callable, *args):
+        ctx = self._browser().new_context()
         try:
-            page.get_by_label(re.compile(r"Anything we need to know\?", re.I)).fill(str(data["notes"]))
-        except Exception:
-            pass
+            return fn(ctx, *args)
+        finally:
+            ctx.close()
+
+    def _close(self):
+        if self._browser_obj is not None:
+            with suppress(Exception):
+                self._browser_obj.close()
+            self._browser_obj = None
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+    def warm_up(self) -> Future:
+        return self._executor.submit(self._browser)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        return self._executor.submit(self._run, fn, *args)
+
+    def close(self):
+        self._executor.submit(self._close).result()
+        self._executor.shutdown()
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    workers = [_BrowserWorker(f"playwright-{i}") for i in range(max(1, PW_WORKERS))]
+    await asyncio.gather(*(asyncio.wrap_future(w.warm_up()) for w in workers))
+    pool: asyncio.Queue = asyncio.Queue()
+    for w in workers:
+        pool.put_nowait(w)
+    app.state.browser_pool = pool
+    try:
+        yield
+    finally:
+        for w in workers:
+            await asyncio.to_thread(w.close)
+
+async def _run_in_browser(fn: Callable, *args):
+    """Borrow a worker, run fn(ctx, *args) on its thread, hand the worker back."""
+    pool: asyncio.Queue = app.state.browser_pool
+    worker = await pool.get()
+    try:
+        return await asyncio.wrap_future(worker.submit(fn, *args))
+    finally:
+        pool.put_nowait(worker)
 
 # -----------------------------
-# FastAPI app
+# Upload helpers
 # -----------------------------
 
-app = FastAPI(title="AI Form Filler Tool", version="0.1.0")
+B64_CHUNK_CHARS = 64 * 1024  # multiple of 4, so every slice decodes on its own
+_WS_RE = re.compile(r"\s")
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+def _b64_to_file(b64: str, path: str) -> None:
+    """Decode base64 into `path` slice by slice so peak memory stays O(chunk)."""
+    if _WS_RE.search(b64):
+        # line-wrapped payloads: drop whitespace so slices stay 4-char aligned
+        b64 = "".join(b64.split())
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as fp:
+        for i in range(0, len(b64), B64_CHUNK_CHARS):
+            fp.write(base64.b64decode(b64[i:i + B64_CHUNK_CHARS]))
 
-@app.post("/discover", response_model=DiscoverResponse)
-def discover(req: FillRequest, x_api_key: Optional[str] = Header(default=None)):
-    require_api_key(x_api_key)
-    logs: List[str] = []
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=req.options.headless, slow_mo=req.options.slow_mo_ms)
-        ctx = browser.new_context()
-        page = ctx.new_page()
+# -----------------------------
+# Request runners (blocking Playwright work, run on a browser worker)
+# -----------------------------
+
+def _run_discover_sync(ctx, req: FillRequest, logs: List[str]) -> List[FieldMatch]:
+    page = ctx.new_page()
+    page.goto(str(req.url), wait_until="domcontentloaded")
+    if req.login:
+        _login_if_needed(page, req.login, req.options.timeout_ms, logs)
         page.goto(str(req.url), wait_until="domcontentloaded")
-        if req.login:
-            _login_if_needed(page, req.login, req.options.timeout_ms, logs)
-            page.goto(str(req.url), wait_until="domcontentloaded")
-        # Verint-specific start flow (reveals fields)
-        if _is_verint(str(req.url)):
-            _verint_start_flow(page, req.options.timeout_ms, logs)
-        disc = _discover_fields(page)
-        matched = _fill_discovered(page, disc, {}, req.options.timeout_ms, logs)
-        ctx.close(); browser.close()
-    return DiscoverResponse(url=str(req.url), discovered=matched)
+    # Verint-specific start flow (reveals fields)
+    if _is_verint(str(req.url)):
+        _verint_start_flow(page, req.options.timeout_ms, logs)
+    return _classify_discovered(_discover_fields(page, with_handles=False))
 
-@app.post("/fill", response_model=FillResponse)
-def fill(req: FillRequest, x_api_key: Optional[str] = Header(default=None)):
-    require_api_key(x_api_key)
-    logs: List[str] = []
+def _run_fill_sync(ctx, req: FillRequest, logs: List[str]) -> Tuple[List[FieldMatch], bool, Optional[str]]:
+    """Returns (matched, submitted, screenshot_path)."""
     screenshot_path: Optional[str] = None
 
     # Prepare temp files from base64 list if provided
     temp_files: List[Tuple[str, str]] = []  # (path, hint)
     for f in req.files:
-        path = f"/tmp/{int(time.time()*1000)}_{f.filename}"
-        with open(path, "wb") as fp:
-            fp.write(base64.b64decode(f.content_b64))
+        # random prefix: concurrent uploads never collide; basename keeps it inside tmp
+        path = os.path.join(tempfile.gettempdir(), f"{secrets.token_hex(8)}_{os.path.basename(f.filename)}")
+        _b64_to_file(f.content_b64, path)
         temp_files.append((path, f.field_hint or f.filename))
         # Allow mapping like data['resume_path'] = path when hint matches
         hint = (f.field_hint or "").lower()
         if hint in ("resume", "cv", "file", "attachment") and "resume_path" not in req.data:
             req.data["resume_path"] = path
 
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=req.options.headless, slow_mo=req.options.slow_mo_ms)
-        ctx = browser.new_context()
-        page = ctx.new_page()
+    page = ctx.new_page()
 
+    page.goto(str(req.url), wait_until="domcontentloaded")
+    if req.login:
+        _login_if_needed(page, req.login, req.options.timeout_ms, logs)
         page.goto(str(req.url), wait_until="domcontentloaded")
-        if req.login:
-            _login_if_needed(page, req.login, req.options.timeout_ms, logs)
-            page.goto(str(req.url), wait_until="domcontentloaded")
 
-        # ✅ Verint 'Start' screen (needed to reveal the form)
-        if _is_verint(str(req.url)):
-            _verint_start_flow(page, req.options.timeout_ms, logs)
+    # ✅ Verint 'Start' screen (needed to reveal the form)
+    if _is_verint(str(req.url)):
+        _verint_start_flow(page, req.options.timeout_ms, logs)
 
-        # Discover all inputs/controls now that the form is visible
-        disc = _discover_fields(page)
+    # Discover all inputs/controls now that the form is visible
+    disc = _discover_fields(page)
 
-        # HSH-specific handling (birthdate selects, owners, bed, shelters, notes)
-        _fill_hsh_specific(page, req.data, req.options.timeout_ms, logs)
+    # HSH-specific handling (birthdate selects, owners, bed, shelters, notes)
+    _fill_hsh_specific(page, req.data, req.options.timeout_ms, logs)
 
-        # Generic AI-ish auto-fill for remaining fields
-        matched = _fill_discovered(page, disc, req.data, req.options.timeout_ms, logs)
+    # Generic AI-ish auto-fill for remaining fields
+    matched = _fill_discovered(page, disc, req.data, req.options.timeout_ms, logs)
 
-        # Try to submit
-        submitted = _submit_if_possible(page, req.submit, req.options.timeout_ms, logs)
+    # Try to submit
+    submitted = _submit_if_possible(page, req.submit, req.options.timeout_ms, logs)
 
-        # Basic error detection
+    # Basic error detection
+    with suppress(Exception):
+        err_count = page.locator("[aria-invalid='true'], .error, .invalid, [role='alert']").count()
+        if err_count:
+            logs.append(f"Validation hints detected: {err_count}")
+
+    if req.options.screenshot:
+        screenshot_path = os.path.join(tempfile.gettempdir(), f"fill_{secrets.token_hex(6)}.png")
         try:
-            err_count = page.locator("[aria-invalid='true'], .error, .invalid, [role='alert']").count()
-            if err_count:
-                logs.append(f"Validation hints detected: {err_count}")
+            page.screenshot(path=screenshot_path, full_page=True)
         except Exception:
-            pass
+            screenshot_path = None
 
-        if req.options.screenshot:
-            screenshot_path = f"/tmp/fill_{int(time.time())}.png"
-            try:
-                page.screenshot(path=screenshot_path, full_page=True)
-            except Exception:
-                screenshot_path = None
+    return matched, submitted, screenshot_path
+
+# -----------------------------
+# FastAPI app
+# -----------------------------
 
-        ctx.close(); browser.close()
+app = FastAPI(
+    title="AI Form Filler Tool",
+    version="0.1.0",
+    lifespan=_lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.post("/discover", response_model=DiscoverResponse)
+async def discover(req: FillRequest, x_api_key: Optional[str] = Header(default=None)):
+    require_api_key(x_api_key)
+    logs: List[str] = []
+    matched = await _run_in_browser(_run_discover_sync, req, logs)
+    return DiscoverResponse(url=str(req.url), discovered=matched)
+
+@app.post("/fill", response_model=FillResponse)
+async def fill(req: FillRequest, x_api_key: Optional[str] = Header(default=None)):
+    require_api_key(x_api_key)
+    logs: List[str] = []
+    matched, submitted, screenshot_path = await _run_in_browser(_run_fill_sync, req, logs)
 
     status = "submitted" if submitted else "filled_no_submit"
     return FillResponse(
@@ -654,7 +868,7 @@ DOCKERFILE = r"""
 FROM mcr.microsoft.com/playwright/python:v1.48.0-jammy
 
 # Install python deps
-RUN pip install --no-cache-dir fastapi uvicorn rapidfuzz python-dotenv "pydantic[email]" requests
+RUN pip install --no-cache-dir fastapi uvicorn rapidfuzz numpy orjson python-dotenv "pydantic[email]" requests
 
 # App
 WORKDIR /app
@@ -1,69 +1,185 @@
 # form_filler_tool.py
 from __future__ import annotations
 
+import asyncio
+import json
+import os
 import re
-from typing import Any, Dict, List
-from playwright.sync_api import sync_playwright, TimeoutError
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+from playwright.async_api import async_playwright, TimeoutError
 
 URL = "https://sanfrancisco.form.us.empro.verintcloudservices.com/form/auto/hsh_shelter_reservation"
+FIRST_FIELD = "#dform_widget_txt_c_forename"  # its visibility means the form is up
+
+# Budget for single actions once the form is known to be up. Long waits
+# (navigation, readiness, confirmation) pass wait_timeout_ms explicitly.
+STEP_TIMEOUT_MS = 2_000
+
+# /dev/shm is tiny in most containers; let Chromium use /tmp instead
+LAUNCH_ARGS = ["--disable-dev-shm-usage"]
+
+# Nothing the fill reads depends on these. Stylesheets stay: field visibility
+# (conditional owner-name inputs) and the screenshots rely on them.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+async def _block_heavy_resources(route) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+# ---------- in-page filling ----------
+# One evaluate fills every field, so the form costs a single round trip
+# instead of a count()/is_visible()/fill() exchange per widget.
+# Each field: {selector, kind: "text"|"select"|"check"|"check_all", value, nth, fallback}
+# where fallback is an optional [selector, index] tried when selector misses.
+# check_all ticks every match of its selector instead of a single element.
+# Lookups are cached per selector until a select/check changes, since those
+# can reveal or insert conditional fields.
+# With a gate selector, a hidden/missing gate plus a visible "Start" button means
+# the form has not begun: the button is clicked and {started: true} returned
+# without filling, so the caller waits for the form and calls again.
+# Returns {missed: indexes of fields not set, checked: values ticked by check_all}.
+FILL_JS = r"""
+({fields, gate}) => {
+    const found = new Map();
+    const all = (sel) => {
+        if (!found.has(sel)) found.set(sel, Array.from(document.querySelectorAll(sel)));
+        return found.get(sel);
+    };
+    const visible = (el) =>
+        el.getClientRects().length > 0 && getComputedStyle(el).visibility !== "hidden";
+    const fire = (el) => {
+        el.dispatchEvent(new Event("input", {bubbles: true}));
+        el.dispatchEvent(new Event("change", {bubbles: true}));
+    };
+    if (gate) {
+        const ready = document.querySelector(gate);
+        if (!ready || !visible(ready)) {
+            const btn = Array.from(document.querySelectorAll(
+                "button, input[type=button], input[type=submit]"
+            )).find((b) => visible(b) && /^start$/i.test(
+                (b.getAttribute("aria-label") || b.textContent || b.value || "").trim()));
+            if (btn) {
+                btn.click();
+                return {started: true, missed: [], checked: []};
+            }
+        }
+    }
+    const missed = [];
+    const checked = [];
+    fields.forEach((f, i) => {
+        const els = all(f.selector);
+        let el = els.length ? els[Math.min(f.nth || 0, els.length - 1)] : null;
+        if (!el && f.fallback) el = all(f.fallback[0])[f.fallback[1]] || null;
+        let ok = false;
+        if (el && f.kind === "text") {
+            if (visible(el)) {
+                el.focus();
+                el.value = f.value;
+                fire(el);
+                el.blur();
+                ok = true;
+            }
+        } else if (el && f.kind === "select") {
+            const opts = Array.from(el.options);
+            const opt = opts.find((o) => o.value === f.value)
+                || opts.find((o) => o.text.trim() === f.value);
+            if (opt) {
+                el.value = opt.value;
+                fire(el);
+                found.clear();
+                ok = true;
+            }
+        } else if (el && f.kind === "check") {
+            if (!el.checked) {
+                el.click();
+                found.clear();
+            }
+            ok = el.checked;
+        } else if (f.kind === "check_all") {
+            for (const box of els) {
+                if (!box.checked) box.click();
+                if (box.checked) checked.push(box.value);
+            }
+            found.clear();
+            ok = checked.length > 0;
+        }
+        if (!ok) missed.push(i);
+    });
+    return {missed, checked};
+}
+"""
+
+# Static part of the form: (selector, kind, data key, default, nth), in fill order.
+# Entries whose value comes out empty are skipped (the widget keeps its blank).
+# Both owner names share one id and sit after both owner selects, so FILL_JS
+# resolves them from one lookup; the alternate takes the second match.
+FORM_PLAN: Tuple[Tuple[str, str, str, str, int], ...] = (
+    (FIRST_FIELD,                                    "text",   "first_name",           "",     0),
+    ("#dform_widget_txt_c_surname",                  "text",   "last_name",            "",     0),
+    ("#dform_widget_sel_BirthMonth",                 "select", "birth_month",          "01",   0),
+    ("#dform_widget_sel_BirthDay",                   "select", "birth_day",            "01",   0),
+    ("#dform_widget_txt_BirthYear",                  "text",   "birth_year",           "",     0),
+    ("#dform_widget_txt_individual_email_address_1", "text",   "email",                "",     0),
+    ("#dform_widget_tel_c_telephone",                "text",   "phone",                "",     0),
+    ("#dform_widget_txt_Extension",                  "text",   "extension",            "",     0),
+    ("#dform_widget_sel_PhoneOwner",                 "select", "phone_owner",          "Self", 0),
+    ("#dform_widget_txt_AltEmail",                   "text",   "alt_email",            "",     0),
+    ("#dform_widget_txt_AlternatePhone",             "text",   "alt_phone",            "",     0),
+    ("#dform_widget_sel_AltPhoneOwner",              "select", "alt_phone_owner",      "N/A",  0),
+    ("#dform_widget_txt_PhoneOwnerName",             "text",   "phone_owner_name",     "",     0),
+    ("#dform_widget_txt_PhoneOwnerName",             "text",   "alt_phone_owner_name", "",     1),
+    ("textarea",                                     "text",   "notes",                "",     0),
+)
+
+# bed_preference -> (radio id, position among BED_RADIOS if the id is missing)
+BED_RADIOS = "input[name='rad_BedPreference']"
+BED_MAP: Dict[str, Tuple[str, int]] = {
+    "male":   ("#dform_widget_rad_BedPreference1", 0),
+    "female": ("#dform_widget_rad_BedPreference2", 1),
+}
 
-# ---------- small helpers ----------
-def _try_fill_visible(page, selector: str, value: str) -> bool:
-    loc = page.locator(selector)
-    if loc.count() == 0:
-        return False
-    try:
-        if loc.first.is_visible():
-            loc.first.fill(value or "")
-            return True
-    except Exception:
-        pass
-    return False
-
-def _try_select(page, selector: str, value: str) -> bool:
-    loc = page.locator(selector)
-    if loc.count() == 0:
-        return False
-    try:
-        try:
-            loc.first.select_option(value=value)
-            return True
-        except Exception:
-            loc.first.select_option(label=value)
-            return True
-    except Exception:
-        return False
-
-def _try_check(page, selector: str) -> bool:
-    loc = page.locator(selector)
-    if loc.count() == 0:
-        return False
-    try:
-        if not loc.first.is_checked():
-            loc.first.check()
-        return True
-    except Exception:
-        return False
+def _field(selector: str, kind: str, value: str = "", nth: int = 0, fallback=None) -> Dict[str, Any]:
+    return {"selector": selector, "kind": kind, "value": value, "nth": nth, "fallback": fallback}
+
+def _plan_fields(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        _field(selector, kind, str(value), nth)
+        for selector, kind, key, default, nth in FORM_PLAN
+        if (value := data.get(key, default))
+    ]
 
 # ---------- confirmation parsing (fallback) ----------
-CONF_SR_RE   = re.compile(r"your\s+service\s+request\s+number\s+is:\s*(\d+)", re.I)
-CONF_WLID_RE = re.compile(r"your\s+waitlist\s+id\s+is:\s*([A-Z0-9]+)", re.I)
+# One pass over the text: whichever branch matched names its group.
+# details is a lookahead so ids printed inside the details block still match.
+CONF_RE = re.compile(
+    r"your\s+service\s+request\s+number\s+is:\s*(?P<sr>\d+)"
+    # on run-together text the id stops where the next label starts
+    r"|your\s+waitlist\s+id\s+is:\s*(?P<wl>[A-Z0-9]+?)(?=[^a-z0-9]|request\s+details|your\s|$)"
+    r"|(?=(?P<details>request\s+details[\s\S]*))",
+    re.I,
+)
+HSPACE_RE = re.compile(r"[ \t]+")
+
+START_RE     = re.compile(r"^start$", re.I)
+# Whole words only, so template ids like "dform_success_message" do not count
+SUCCESS_RE   = re.compile(r"\b(?:thanks?|submitted|success(?:ful|fully)?)\b", re.I)
 
 def _parse_confirmation_text(full_text: str) -> Dict[str, str]:
     """Fallback parser from page text."""
     out: Dict[str, str] = {}
     if not full_text:
         return out
-    sr = CONF_SR_RE.search(full_text)
-    if sr:
-        out["service_request_number"] = sr.group(1)
-    wl = CONF_WLID_RE.search(full_text)
-    if wl:
-        out["waitlist_id"] = wl.group(1)
-    idx = full_text.lower().find("request details")
-    if idx != -1:
-        details = full_text[idx:].strip()
-        out["request_details_text"] = re.sub(r"[ \t]+", " ", details)
+    for m in CONF_RE.finditer(full_text):
+        if m.group("sr") is not None:
+            out.setdefault("service_request_number", m.group("sr"))
+        elif m.group("wl") is not None:
+            out.setdefault("waitlist_id", m.group("wl"))
+        elif "request_details_text" not in out:
+            out["request_details_text"] = HSPACE_RE.sub(" ", m.group("details").strip())
     return out
 
 # Exact DOM extraction using data-mapfrom
@@ -74,30 +190,58 @@ MAPFROM_SELECTORS = {
     "shelters_confirm": "mchk_SheltersPreference",
 }
 
-def _extract_mapfrom(page) -> Dict[str, str]:
-    out: Dict[str, str] = {}
-    for key, val in MAPFROM_SELECTORS.items():
-        try:
-            loc = page.locator(f"[data-mapfrom='{val}']")
-            if loc.count() > 0:
-                txt = loc.first.inner_text().strip()
-                if txt:
-                    out[key] = txt
-        except Exception:
-            pass
-    return out
+MAPFROM_KEYS = {v: k for k, v in MAPFROM_SELECTORS.items()}
+
+# One traversal for every key; the first element per data-mapfrom wins.
+EXTRACT_MAPFROM_JS = r"""
+(keys) => {
+    const out = {};
+    const seen = new Set();
+    document.querySelectorAll("[data-mapfrom]").forEach((el) => {
+        const src = el.getAttribute("data-mapfrom");
+        if (!Object.hasOwn(keys, src) || seen.has(src)) return;
+        seen.add(src);
+        const txt = el.innerText.trim();
+        if (txt) out[keys[src]] = txt;
+    });
+    return out;
+}
+"""
+
+# Installed once per context with add_init_script, so every document already has
+# the helpers and each evaluate only ships a one-line call instead of the source.
+INIT_JS = (
+    f"window.__fill_form__ = {FILL_JS.strip()};\n"
+    f"window.__extract_mapfrom__ = {EXTRACT_MAPFROM_JS.strip()};\n"
+)
+CALL_FILL_JS = "(plan) => window.__fill_form__(plan)"
+CALL_EXTRACT_MAPFROM_JS = "(keys) => window.__extract_mapfrom__(keys)"
+
+async def _extract_mapfrom(page) -> Dict[str, str]:
+    return await page.evaluate(CALL_EXTRACT_MAPFROM_JS, MAPFROM_KEYS)
 
 # ---------- main tool ----------
-def fill_hsh_form(
+async def fill_hsh_form(
     data: Dict[str, Any],
     *,
     headless: bool = True,
     slow_mo_ms: int = 0,
-    wait_timeout_ms: int = 45_000,  # generous default
+    wait_timeout_ms: int = 30_000,  # navigation/readiness/confirmation budget
+    capture_screenshots: bool = True,
+    browser=None,
 ) -> Dict[str, Any]:
     """
     Fill & submit the SF HSH shelter reservation form.
 
+    Pass an already launched `browser` to skip the Playwright start-up and
+    Chromium launch; each call still gets its own context (and cookies), so
+    concurrent calls can share one browser.
+    headless/slow_mo_ms only apply when the browser is launched here.
+    Screenshots go into a new temp directory per call (filled_form.jpg,
+    after_submit.jpg); the caller owns it and should delete it once the images
+    have been used, e.g. shutil.rmtree(os.path.dirname(result["screenshot_after"])).
+    With capture_screenshots=False nothing is written and both paths are None.
+
     Returns:
       {
         success, message, logs,
@@ -108,120 +252,111 @@ def fill_hsh_form(
         }
       }
     """
-    screenshot_before = "filled_form.png"
-    screenshot_after = "after_submit.png"
+    # Per-call directory: concurrent fills must not overwrite each other's evidence
+    screenshot_before: Optional[str] = None
+    screenshot_after: Optional[str] = None
+    shot_dir: Optional[str] = None
+    if capture_screenshots:
+        shot_dir = tempfile.mkdtemp(prefix="hsh_fill_")
+        screenshot_before = os.path.join(shot_dir, "filled_form.jpg")
+        screenshot_after = os.path.join(shot_dir, "after_submit.jpg")
     logs: List[str] = []
 
-    def safe_goto(page, url: str, attempts: int = 2):
+    async def snap(page, path: Optional[str]) -> None:
+        if not path:
+            return
+        try:
+            # viewport only: full_page re-lays out the whole document; the
+            # confirmation box is in view after submit
+            await page.screenshot(path=path, type="jpeg", quality=70, timeout=wait_timeout_ms)
+        except Exception:
+            pass
+
+    async def safe_goto(page, url: str, attempts: int = 2):
         # Robust navigation: try; if slow/blank, reload once.
+        # Readiness is gated on the first form field below, not networkidle.
         for i in range(attempts):
             try:
-                page.goto(url, wait_until="load")
-                page.wait_for_load_state("networkidle", timeout=wait_timeout_ms)
+                await page.goto(url, wait_until="domcontentloaded")
                 return
             except TimeoutError:
                 if i == attempts - 1:
                     raise
                 logs.append("Goto timed out; reloading once…")
                 try:
-                    page.reload(wait_until="load")
-                    page.wait_for_load_state("networkidle", timeout=wait_timeout_ms)
+                    await page.reload(wait_until="domcontentloaded")
                     return
                 except Exception:
                     pass
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless, slow_mo=slow_mo_ms)
-        ctx = browser.new_context()
-        page = ctx.new_page()
-        page.set_default_timeout(wait_timeout_ms)
-        page.set_default_navigation_timeout(wait_timeout_ms)
-
+    async def body_text(page) -> str:
         try:
-            # Navigate (robust)
-            safe_goto(page, URL)
-
-            # Some Verint forms show a "Start" step; click if present
-            try:
-                start = page.get_by_role("button", name=re.compile(r"^start$", re.I))
-                if start.count() > 0 and start.first.is_visible():
-                    start.first.click()
-                    page.wait_for_load_state("networkidle", timeout=wait_timeout_ms)
-            except Exception:
-                pass
+            return await page.inner_text("body")
+        except Exception:
+            return ""
 
-            # Ensure first field is visible before filling
-            page.wait_for_selector("#dform_widget_txt_c_forename", timeout=wait_timeout_ms)
+    async def mapfrom(page) -> Dict[str, str]:
+        try:
+            return await _extract_mapfrom(page)
+        except Exception:
+            return {}
 
-            # ----- Participant info -----
-            _try_fill_visible(page, "#dform_widget_txt_c_forename", data.get("first_name", ""))
-            _try_fill_visible(page, "#dform_widget_txt_c_surname",  data.get("last_name", ""))
+    async def run(browser) -> Dict[str, Any]:
+        ctx = await browser.new_context()
+        page = None
+        try:
+            # Setup sits inside the try: on a shared browser a context left open by
+            # a failed route/init-script/new_page would live as long as the server
+            await ctx.route("**/*", _block_heavy_resources)
+            await ctx.add_init_script(script=INIT_JS)
+            page = await ctx.new_page()
+            page.set_default_timeout(STEP_TIMEOUT_MS)
+            page.set_default_navigation_timeout(wait_timeout_ms)
 
-            _try_select(page, "#dform_widget_sel_BirthMonth", data.get("birth_month", "01"))
-            _try_select(page, "#dform_widget_sel_BirthDay",   data.get("birth_day", "01"))
-            _try_fill_visible(page, "#dform_widget_txt_BirthYear", data.get("birth_year", ""))
+            # Navigate (robust)
+            await safe_goto(page, URL)
 
-            _try_fill_visible(page, "#dform_widget_txt_individual_email_address_1", data.get("email", ""))
-            _try_fill_visible(page, "#dform_widget_tel_c_telephone",                data.get("phone", ""))
-            if data.get("extension"):
-                _try_fill_visible(page, "#dform_widget_txt_Extension", data["extension"])
+            # Without networkidle, wait until either the form or its Start step renders
+            start = page.get_by_role("button", name=START_RE)
+            await page.locator(FIRST_FIELD).or_(start).filter(visible=True).first.wait_for(
+                state="visible", timeout=wait_timeout_ms)
 
-            # ----- Phone owner + conditional name -----
-            _try_select(page, "#dform_widget_sel_PhoneOwner", data.get("phone_owner", "Self"))
-            try:
-                owner_name = data.get("phone_owner_name", "")
-                owner_name_loc = page.locator("#dform_widget_txt_PhoneOwnerName")
-                if owner_name and owner_name_loc.count() > 0 and owner_name_loc.first.is_visible():
-                    owner_name_loc.first.fill(owner_name)
-            except Exception:
-                logs.append("Owner name field skipped (hidden or not present).")
-
-            # ----- Alternate contact -----
-            if data.get("alt_email"):
-                _try_fill_visible(page, "#dform_widget_txt_AltEmail", data["alt_email"])
-            if data.get("alt_phone"):
-                _try_fill_visible(page, "#dform_widget_txt_AlternatePhone", data["alt_phone"])
-            _try_select(page, "#dform_widget_sel_AltPhoneOwner", data.get("alt_phone_owner", "N/A"))
-            try:
-                alt_owner_name = data.get("alt_phone_owner_name", "")
-                alt_owner_loc = page.locator("#dform_widget_txt_PhoneOwnerName")
-                if alt_owner_name:
-                    if alt_owner_loc.count() > 1 and alt_owner_loc.nth(1).is_visible():
-                        alt_owner_loc.nth(1).fill(alt_owner_name)
-                    elif alt_owner_loc.count() == 1 and alt_owner_loc.first.is_visible():
-                        alt_owner_loc.first.fill(alt_owner_name)
-            except Exception:
-                pass
+            # ----- Fill plan: static widgets, then bed and shelters, in one evaluate -----
+            fields = _plan_fields(data)
 
-            # ----- Bed preference -----
             bed = (data.get("bed_preference") or "").lower()
-            if bed == "male":
-                if not _try_check(page, "#dform_widget_rad_BedPreference1"):
-                    page.locator("input[name='rad_BedPreference']").first.check()
-            elif bed == "female":
-                if not _try_check(page, "#dform_widget_rad_BedPreference2"):
-                    page.locator("input[name='rad_BedPreference']").nth(1).check()
-
-            # ----- Shelters -----
-            for val in data.get("shelters", []):
-                if not _try_check(page, f"input[value='{val}']"):
+            bed_idx = None
+            if bed in BED_MAP:
+                bed_idx = len(fields)
+                selector, nth = BED_MAP[bed]
+                fields.append(_field(selector, "check", fallback=[BED_RADIOS, nth]))
+
+            # Shelters: one query for the whole list, diffed against what got ticked
+            shelters = [str(v) for v in data.get("shelters", [])]
+            if shelters:
+                values = ",".join(f"[value={json.dumps(v, ensure_ascii=False)}]" for v in shelters)
+                fields.append(_field(f"input:is({values})", "check_all"))
+
+            # The evaluate also handles the "Start" step some Verint forms show first;
+            # only then is a second round trip (wait for the form, fill) needed.
+            filled = await page.evaluate(CALL_FILL_JS, {"fields": fields, "gate": FIRST_FIELD})
+            if filled.get("started"):
+                await page.wait_for_selector(FIRST_FIELD, state="visible", timeout=wait_timeout_ms)
+                filled = await page.evaluate(CALL_FILL_JS, {"fields": fields})
+            if bed_idx is not None and bed_idx in filled["missed"]:
+                logs.append(f"Could not set bed preference: {bed}")
+            ticked = set(filled["checked"])
+            for val in shelters:
+                if val not in ticked:
                     logs.append(f"Could not check shelter: {val}")
 
-            # ----- Notes -----
-            try:
-                if data.get("notes"):
-                    page.locator("textarea").first.fill(data["notes"])
-            except Exception:
-                pass
-
             # Pre-submit screenshot
-            try:
-                page.screenshot(path=screenshot_before, full_page=True)
-            except Exception:
-                pass
+            await snap(page, screenshot_before)
 
             # Submit
-            page.click("#dform_widget_button_but_WFR1W8U0")
+            # Submitting starts a navigation, so it keeps the full budget rather than
+            # STEP_TIMEOUT_MS: a slow server must not turn a sent form into an error
+            await page.click("#dform_widget_button_but_WFR1W8U0", timeout=wait_timeout_ms)
 
             # ----- Success detection (fixed) -----
             success = False
@@ -231,53 +366,29 @@ def fill_hsh_form(
             try:
                 css_targets = "#dform_success_message, .dform_confirmation, .dform_message"
                 conf = page.locator(css_targets).first
-                conf.wait_for(state="visible", timeout=15_000)
-                message = conf.inner_text()
+                await conf.wait_for(state="visible", timeout=wait_timeout_ms)
+                message = await conf.inner_text()
                 success = True
             except Exception:
-                # 2) fallback: look for common success words via text engine (separately)
-                for txt in [r"\bthank\b", r"\bsubmitted\b", r"\bsuccess\b"]:
-                    try:
-                        conf = page.get_by_text(re.compile(txt, re.I)).first
-                        conf.wait_for(state="visible", timeout=8_000)
-                        message = conf.inner_text()
-                        success = True
-                        break
-                    except Exception:
-                        pass
-
-            # 3) last resort: scan raw HTML for keywords
-            if not success:
-                try:
-                    html = page.content().lower()
-                    if any(w in html for w in ["thank", "submitted", "success"]):
-                        success = True
-                        message = "Success keywords detected in page HTML."
-                except Exception:
-                    pass
+                pass
 
-            # ----- Extract confirmation values -----
-            confirmation: Dict[str, str] = {}
-            # 1) exact DOM values via data-mapfrom
-            try:
-                confirmation = _extract_mapfrom(page)
-            except Exception:
-                confirmation = {}
+            # The page has settled: read body text (keyword fallback + parser) and the
+            # data-mapfrom values while the final screenshot is being taken
+            full_text, confirmation, _ = await asyncio.gather(
+                body_text(page), mapfrom(page), snap(page, screenshot_after))
 
-            # 2) fallback from page text
-            try:
-                full_text = page.inner_text("body")
-                parsed = _parse_confirmation_text(full_text)
-                for k, v in parsed.items():
-                    confirmation.setdefault(k, v)
-            except Exception:
-                pass
+            # 2) fallback: success words anywhere in the visible text
+            if not success:
+                hit = SUCCESS_RE.search(full_text)
+                if hit is not None:
+                    success = True
+                    line_start = full_text.rfind("\n", 0, hit.start()) + 1
+                    line_end = full_text.find("\n", hit.end())
+                    message = full_text[line_start:line_end if line_end != -1 else None].strip()
 
-            # Final screenshot
-            try:
-                page.screenshot(path=screenshot_after, full_page=True)
-            except Exception:
-                pass
+            # ----- Confirmation values: data-mapfrom first, page text fills gaps -----
+            for k, v in _parse_confirmation_text(full_text).items():
+                confirmation.setdefault(k, v)
 
             return {
                 "success": success,
@@ -289,10 +400,8 @@ def fill_hsh_form(
             }
 
         except Exception as e:
-            try:
-                page.screenshot(path=screenshot_after, full_page=True)
-            except Exception:
-                pass
+            if page is not None:
+                await snap(page, screenshot_after)
             return {
                 "success": False,
                 "message": f"Unhandled error during fill/submit: {e}",
@@ -302,8 +411,22 @@ def fill_hsh_form(
                 "confirmation": {},
             }
         finally:
-            ctx.close()
-            browser.close()
+            await ctx.close()
+
+    try:
+        if browser is not None:
+            return await run(browser)
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless, slow_mo=slow_mo_ms, args=LAUNCH_ARGS)
+            try:
+                return await run(browser)
+            finally:
+                await browser.close()
+    except BaseException:
+        # No result carries the paths back to the caller, so nobody else can remove them
+        if shot_dir is not None:
+            shutil.rmtree(shot_dir, ignore_errors=True)
+        raise
 
 # Optional manual test
 if __name__ == "__main__":
@@ -326,4 +449,4 @@ if __name__ == "__main__":
         "shelters": ["MSC_south", "next_door", "sanctuary"],
         "notes": "No stairs, please."
     }
-    print(fill_hsh_form(sample, headless=False, slow_mo_ms=250))
+    print(asyncio.run(fill_hsh_form(sample, headless=False, slow_mo_ms=250)))
@@ -1,23 +1,99 @@
 # tool_api.py
+import asyncio
+import base64
+import hmac
+import os
+import shutil
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI, Header, HTTPException
-from form_filler_tool import fill_hsh_form  # <-- your Playwright tool
+from playwright.async_api import async_playwright
+from form_filler_tool import LAUNCH_ARGS, fill_hsh_form  # <-- your Playwright tool
 
 API_KEY = "changeme"  # set to None to disable auth
+MAX_CONCURRENT_FILLS = int(os.getenv("MAX_CONCURRENT_FILLS", "4"))  # open contexts at once
+
+class _Browser:
+    """
+    One async Playwright driver and one headless Chromium for the process, shared by
+    all requests; fill_hsh_form opens a fresh context per call, so concurrent fills
+    never share cookies. The browser is relaunched only if it has disconnected.
+    """
+
+    def __init__(self, pw):
+        self._pw = pw
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                self._browser = await self._pw.chromium.launch(headless=True, args=LAUNCH_ARGS)
+            return self._browser
 
-app = FastAPI(title="HSH Form Filler Tool")
+    async def close(self):
+        if self._browser is not None:
+            with suppress(Exception):
+                await self._browser.close()
+            self._browser = None
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    async with async_playwright() as pw:
+        browser = _Browser(pw)
+        await browser.get()  # warm it before serving
+        app.state.browser = browser
+        app.state.fill_slots = asyncio.Semaphore(max(1, MAX_CONCURRENT_FILLS))
+        try:
+            yield
+        finally:
+            await browser.close()
+
+app = FastAPI(title="HSH Form Filler Tool", lifespan=_lifespan)
+
+# Request keys that configure the run rather than describe the applicant.
+# headless/slow_mo_ms are accepted but ignored: the server only runs its one
+# warm headless browser (use hsh_form_filler.py to watch a fill).
+OPTION_KEYS = frozenset({"headless", "slow_mo_ms", "wait_timeout_ms", "capture_screenshots"})
 
 def _require_key(x_api_key: str | None):
-    if API_KEY and x_api_key != API_KEY:
+    if API_KEY and not hmac.compare_digest((x_api_key or "").encode(), API_KEY.encode()):
         raise HTTPException(status_code=401, detail="Invalid API key")
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+def _inline_screenshots(result: dict) -> dict:
+    """
+    Move the screenshots into the response as base64 JPEG (screenshot_*_b64) and
+    delete fill_hsh_form's per-call directory, so the server keeps nothing on disk.
+    The path fields are cleared: they would point at files that no longer exist.
+    """
+    dirs = set()
+    for key in ("screenshot_before", "screenshot_after"):
+        path = result.get(key)
+        result[key] = None
+        result[f"{key}_b64"] = None
+        if not path:
+            continue
+        dirs.add(os.path.dirname(path))
+        with suppress(OSError):
+            with open(path, "rb") as fp:
+                result[f"{key}_b64"] = base64.b64encode(fp.read()).decode()
+    for d in dirs:
+        shutil.rmtree(d, ignore_errors=True)
+    return result
+
 @app.post("/fill_hsh_form")
-def fill_hsh_form_endpoint(data: dict, x_api_key: str | None = Header(default=None)):
+async def fill_hsh_form_endpoint(data: dict, x_api_key: str | None = Header(default=None)):
     _require_key(x_api_key)
-    headless = bool(data.pop("headless", True))
-    slow = int(data.pop("slow_mo_ms", 0))
-    timeout = int(data.pop("wait_timeout_ms", 15_000))
-    return fill_hsh_form(data, headless=headless, slow_mo_ms=slow, wait_timeout_ms=timeout)
+    timeout = int(data.get("wait_timeout_ms", 15_000))
+    # Off unless asked for; when on, the images come back inline (see _inline_screenshots)
+    screenshots = bool(data.get("capture_screenshots", False))
+    fields = {k: v for k, v in data.items() if k not in OPTION_KEYS}
+    async with app.state.fill_slots:
+        browser = await app.state.browser.get()
+        result = await fill_hsh_form(fields, wait_timeout_ms=timeout,
+                                     capture_screenshots=screenshots, browser=browser)
+    return await asyncio.to_thread(_inline_screenshots, result)